@@ -10,7 +10,10 @@
 
 import argparse
 import collections
+import concurrent.futures
 import difflib
+import functools
+import gzip
 import hashlib
 import io
 import itertools
@@ -21,11 +24,17 @@ import re
 import subprocess
 import sys
 import textwrap
-from urllib.parse import urlparse
+import threading
 from xml.sax import saxutils
 
 import requests
 
+try:
+    # If available, use the much faster `orjson` to parse the large documents output by cargo.
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 # handy for debugging; WARNING (default), INFO, and DEBUG can all be useful
 logging.basicConfig(level=logging.WARNING)
 
@@ -85,11 +94,21 @@ LICENSES_IN_PREFERENCE_ORDER = [
     "EXT-OPENSSL",
     "EXT-SQLITE",
 ]
+# The position of each license in the above list, for quick comparisons.
+LICENSE_RANK = {license: i for i, license in enumerate(LICENSES_IN_PREFERENCE_ORDER)}
+
+# The separators between alternative licenses in SPDX-style license identifiers,
+# as in "MIT/Apache-2.0" or "MIT OR Apache-2.0".
+LICENSE_ALTERNATIVES_SEPARATOR_RE = re.compile(r"\s*(?:/|\sOR\s)\s*")
+
+# Licenses whose text is standard enough that all dependencies using them can share
+# a single copy of it, rather than listing each dependency's copy separately.
+SHARED_TEXT_LICENSES = frozenset(("MPL-2.0", "Apache-2.0"))
 
 # Packages that get pulled into our dependency tree but we know we definitely don't
 # ever build with in practice, typically because they're platform-specific support
 # for platforms we don't actually support.
-EXCLUDED_PACKAGES = set(
+EXCLUDED_PACKAGES = frozenset(
     [
         "cloudabi",
         "fuchsia-cprng",
@@ -976,6 +995,32 @@ PACKAGE_METADATA_FIXUPS = {
     },
 }
 
+# Matches the start of raw github file URLs, which we convert back into human-friendly page URLs.
+RAW_GITHUB_URL_RE = re.compile(r"raw\.githubusercontent\.com/([^/]+)/([^/]+)/")
+
+# How to turn a lowercased markdown header into the anchor that links to it.
+MARKDOWN_ANCHOR_TRANSLATION = str.maketrans({" ": "-", ".": None, ",": None, ":": None})
+
+# The package metadata fields that we actually use. Everything else reported by `cargo metadata`
+# (such as each package's full dependency and feature lists) is discarded to save memory.
+PACKAGE_INFO_FIELDS = frozenset(
+    [
+        "id",
+        "name",
+        "version",
+        "source",
+        "manifest_path",
+        "repository",
+        "license",
+        "license_file",
+        "license_url",
+        "license_text",
+    ]
+)
+# For workspace members we also need their build targets, to decide which platforms they can
+# be built for. Other packages' target lists can be large, so we don't keep them.
+WORKSPACE_MEMBER_INFO_FIELDS = PACKAGE_INFO_FIELDS | {"targets"}
+
 # Sets of common licence file names, by license type.
 # If we can find one and only one of these files in a package, then we can be confident
 # that it's the intended license text.
@@ -987,37 +1032,271 @@ COMMON_LICENSE_FILE_NAME_ROOTS = {
     "Zlib": ["license-zlib", "license-zlib"],
 }
 COMMON_LICENSE_FILE_NAME_SUFFIXES = ["", ".md", ".txt"]
-COMMON_LICENSE_FILE_NAMES = {}
-for license in COMMON_LICENSE_FILE_NAME_ROOTS:
-    COMMON_LICENSE_FILE_NAMES[license] = set()
-    for suffix in COMMON_LICENSE_FILE_NAME_SUFFIXES:
-        for root in COMMON_LICENSE_FILE_NAME_ROOTS[license]:
-            COMMON_LICENSE_FILE_NAMES[license].add(root + suffix)
-        for root in COMMON_LICENSE_FILE_NAME_ROOTS[""]:
-            COMMON_LICENSE_FILE_NAMES[license].add(root + suffix)
-
-
-def subprocess_run_cargo(args):
-    """Run `cargo` as a subprocess, returning stdout."""
+COMMON_LICENSE_FILE_NAMES = {
+    license: frozenset(
+        root + suffix
+        for suffix in COMMON_LICENSE_FILE_NAME_SUFFIXES
+        for root in roots + COMMON_LICENSE_FILE_NAME_ROOTS[""]
+    )
+    for license, roots in COMMON_LICENSE_FILE_NAME_ROOTS.items()
+}
+
+# Where to cache the output of slow `cargo` invocations and HTTP requests between runs.
+# Set this to `None` (e.g. using the `--no-cache` option) to always run `cargo` afresh.
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "dependency_summary",
+)
+
+# Files whose contents determine the output of `cargo metadata` and `cargo build --build-plan`,
+# and directories that we don't need to search for them.
+CARGO_FINGERPRINT_FILE_NAMES = frozenset(
+    ["Cargo.toml", "Cargo.lock", "rust-toolchain.toml"]
+)
+CARGO_FINGERPRINT_SKIP_DIRS = frozenset(["target", "build", "node_modules"])
+# The root of the cargo workspace that this script lives in. We use this rather than the current
+# directory so that the cache fingerprint doesn't depend on where the script is run from.
+CARGO_WORKSPACE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Cargo config files that can change its output, e.g. via `[patch]` or `[source]` replacement.
+# These live in hidden directories that we don't otherwise search.
+CARGO_CONFIG_FILES = [
+    os.path.join(cargoDir, name)
+    for cargoDir in [
+        os.path.join(CARGO_WORKSPACE_ROOT, ".cargo"),
+        os.environ.get("CARGO_HOME") or os.path.expanduser("~/.cargo"),
+    ]
+    for name in ["config.toml", "config"]
+]
+
+# A shared HTTP session for fetching license details, so that the many concurrent requests
+# we make to the same few hosts can reuse connections rather than each doing a TLS handshake.
+HTTP_MAX_CONCURRENT_REQUESTS = 32
+# How long to wait for a response from the server, in seconds.
+HTTP_TIMEOUT = 10
+# Text fetched by `http_get_text`, as futures keyed by URL.
+HTTP_TEXT_BY_URL = {}
+HTTP_TEXT_BY_URL_LOCK = threading.Lock()
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount(
+    "https://",
+    requests.adapters.HTTPAdapter(
+        pool_connections=16, pool_maxsize=HTTP_MAX_CONCURRENT_REQUESTS
+    ),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def get_cargo_fingerprint():
+    """Get a fingerprint of the workspace state that determines the output of `cargo`.
+
+    This hashes the path, mtime and size of every cargo manifest, lockfile and config file
+    in the workspace, so that it changes whenever any of those files are edited.
+    """
+    stats = []
+    for root, dirs, files in os.walk(CARGO_WORKSPACE_ROOT):
+        # Prune build output and hidden directories, which can be large and never contain
+        # manifests that are part of the workspace.
+        dirs[:] = [
+            d
+            for d in dirs
+            if not d.startswith(".") and d not in CARGO_FINGERPRINT_SKIP_DIRS
+        ]
+        for nm in files:
+            if nm in CARGO_FINGERPRINT_FILE_NAMES:
+                path = os.path.join(root, nm)
+                st = os.stat(path)
+                stats.append((path, st.st_mtime_ns, st.st_size))
+    for path in CARGO_CONFIG_FILES:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        stats.append((path, st.st_mtime_ns, st.st_size))
+    h = hashlib.blake2b(digest_size=16)
+    for path, mtime, size in sorted(stats):
+        h.update(f"{path}\0{mtime}\0{size}\0".encode("utf8"))
+    return h.hexdigest()
+
+
+def subprocess_run_cargo(args, useCachedOutput=True):
+    """Run `cargo` as a subprocess, returning stdout as bytes.
+
+    The output is left undecoded, since it's typically JSON that can be parsed directly from bytes.
+
+    Unless `CACHE_DIR` is `None`, the output is cached on disk keyed by the arguments, and is
+    only used if it was produced with the current fingerprint of the workspace's manifests.
+    Keeping a single file per set of arguments means the cache doesn't grow every time the
+    manifests change. It is deliberately not memoized in memory, since the output can be many
+    megabytes and callers only need to parse it once.
+    Pass `useCachedOutput=False` to run `cargo` afresh, while still caching its new output.
+    """
+    cacheFile = None
+    if CACHE_DIR is not None:
+        key = hashlib.blake2b(json.dumps(args).encode("utf8"), digest_size=16)
+        cacheFile = os.path.join(CACHE_DIR, key.hexdigest() + ".cargo-output.gz")
+        # The fingerprint is stored on the first line of the file, ahead of the output.
+        fingerprint = get_cargo_fingerprint().encode("utf8") + b"\n"
+    if cacheFile is not None and useCachedOutput:
+        try:
+            with gzip.open(cacheFile, "rb") as f:
+                if f.readline() == fingerprint:
+                    logging.info("using cached output for cargo %s", args)
+                    return f.read()
+        except FileNotFoundError:
+            pass
     env = os.environ.copy()
+    # Try running offline first, which avoids cargo checking for updates to the registry index.
+    # This fails if any of the locked dependencies haven't been downloaded yet, in which case
+    # we run again with network access.
     p = subprocess.run(
-        ("cargo",) + args,
+        ("cargo",) + args + ("--offline",),
         env=env,
         stdout=subprocess.PIPE,
-        text=True,
+        stderr=subprocess.PIPE,
         check=False,
     )
-    p.check_returncode()
+    if p.returncode == 0:
+        sys.stderr.write(p.stderr.decode("utf8", errors="replace"))
+    else:
+        logging.info("offline cargo %s failed, retrying online", args)
+        p = subprocess.run(
+            ("cargo",) + args,
+            env=env,
+            stdout=subprocess.PIPE,
+            check=False,
+        )
+        p.check_returncode()
+    if cacheFile is not None:
+        # The output is highly repetitive JSON, which compresses by an order of magnitude.
+        write_cache_file(cacheFile, gzip.compress(fingerprint + p.stdout))
     return p.stdout
 
 
-def get_workspace_metadata():
-    """Get metadata for all dependencies in the workspace."""
-    return WorkspaceMetadata(
-        json.loads(
-            subprocess_run_cargo(("metadata", "--locked", "--format-version", "1"))
+def http_get_text(url):
+    """Fetch the text content at the given URL.
+
+    Results are memoized, since many dependencies share the same remote license file.
+    If several threads ask for the same URL at once, only one of them fetches it.
+    """
+    with HTTP_TEXT_BY_URL_LOCK:
+        result = HTTP_TEXT_BY_URL.get(url)
+        isFetcher = result is None
+        if isFetcher:
+            result = HTTP_TEXT_BY_URL[url] = concurrent.futures.Future()
+    if isFetcher:
+        try:
+            result.set_result(http_get_text_uncached(url))
+        except Exception as e:
+            result.set_exception(e)
+    return result.result()
+
+
+def http_get_text_uncached(url):
+    """Fetch the text content at the given URL, without consulting the in-memory cache.
+
+    Unless `CACHE_DIR` is `None`, responses are cached on disk and revalidated using their
+    `ETag` or `Last-Modified` headers, so that unchanged content is not downloaded again.
+    """
+    if CACHE_DIR is None:
+        r = HTTP_SESSION.get(url, timeout=HTTP_TIMEOUT)
+        r.raise_for_status()
+        return r.content.decode("utf8")
+    cacheFile = os.path.join(
+        CACHE_DIR,
+        hashlib.blake2b(url.encode("utf8"), digest_size=16).hexdigest() + ".http",
+    )
+    headers = {}
+    try:
+        with open(cacheFile, encoding="utf8") as f:
+            cached = json_loads(f.read())
+    except FileNotFoundError:
+        cached = None
+    else:
+        if cached["etag"] is not None:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"] is not None:
+            headers["If-Modified-Since"] = cached["last_modified"]
+    r = HTTP_SESSION.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+    if r.status_code == 304 and cached is not None:
+        logging.info("using cached content for %s", url)
+        return cached["text"]
+    r.raise_for_status()
+    text = r.content.decode("utf8")
+    etag = r.headers.get("ETag")
+    lastModified = r.headers.get("Last-Modified")
+    if etag is not None or lastModified is not None:
+        write_cache_file(
+            cacheFile,
+            json.dumps(
+                {
+                    "url": url,
+                    "etag": etag,
+                    "last_modified": lastModified,
+                    "text": text,
+                }
+            ).encode("utf8"),
         )
+    return text
+
+
+@functools.lru_cache(maxsize=None)
+def read_text_file(path):
+    """Read the text content of a local file.
+
+    This is memoized, since crates from the same source repository often share a license file.
+    Callers should pass a canonical path for it to be effective.
+    """
+    with open(path) as f:
+        return f.read()
+
+
+def write_cache_file(path, content):
+    """Write bytes to a file in `CACHE_DIR`, atomically so that concurrent runs never see partial content."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmpPath = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmpPath, "wb") as f:
+        f.write(content)
+    os.replace(tmpPath, path)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_most_acceptable_license(licenseId):
+    """Parse an SPDX-style license identifier and pick the best license it allows, or `None`.
+
+    This is memoized, since many dependencies share the same license identifier.
+    """
+    # Special cases for the very few deps with "AND" in their license.
+    # `encoding_rs`
+    if licenseId == "(Apache-2.0 OR MIT) AND BSD-3-Clause":
+        return licenseId
+    # `unicode-ident`
+    if licenseId == "(MIT OR Apache-2.0) AND Unicode-3.0":
+        return licenseId
+
+    # Split "A/B" and "A OR B" into individual license names.
+    licenses = set(
+        l.strip() for l in LICENSE_ALTERNATIVES_SEPARATOR_RE.split(licenseId)
     )
+    # Try to pick the "best" compatible license available.
+    acceptableLicenses = licenses & LICENSE_RANK.keys()
+    if not acceptableLicenses:
+        return None
+    return min(acceptableLicenses, key=LICENSE_RANK.__getitem__)
+
+
+def get_workspace_metadata():
+    """Get metadata for all dependencies in the workspace."""
+    args = ("metadata", "--locked", "--format-version", "1")
+    metadata = json_loads(subprocess_run_cargo(args))
+    # Cached output may refer to dependency sources that have since been removed from cargo's
+    # registry cache, in which case we need to run cargo again so that it re-downloads them.
+    if not all(os.path.exists(pkg["manifest_path"]) for pkg in metadata["packages"]):
+        logging.info("dependency sources are missing, re-running cargo %s", args)
+        metadata = json_loads(subprocess_run_cargo(args, useCachedOutput=False))
+    # We find dependencies using the build plan rather than cargo's resolved dependency graph,
+    # so there's no need to keep the (large) graph in memory.
+    metadata.pop("resolve", None)
+    return WorkspaceMetadata(metadata)
 
 
 class WorkspaceMetadata:
@@ -1033,27 +1312,46 @@ class WorkspaceMetadata:
 
     def __init__(self, metadata):
         self.metadata = metadata
+        self.workspaceRootPrefix = metadata["workspace_root"].rstrip(os.sep) + os.sep
         self.pkgInfoById = {}
         self.pkgInfoByManifestPath = {}
         self.workspaceMembersByName = {}
+        self.extraDependenciesById = {}
+        # Many dependencies have identical license text (particularly Apache-2.0), so we
+        # keep a single copy of each distinct text rather than one per dependency.
+        self.licenseTexts = {}
+        workspaceMemberIds = frozenset(metadata["workspace_members"])
         for info in metadata["packages"]:
             if info["name"] in EXCLUDED_PACKAGES:
                 continue
             # Apply any hand-rolled fixups, carefully checking that they haven't been invalidated.
-            if info["name"] in PACKAGE_METADATA_FIXUPS:
-                fixups = PACKAGE_METADATA_FIXUPS[info["name"]]
+            fixups = PACKAGE_METADATA_FIXUPS.get(info["name"])
+            if fixups is not None:
                 for key, change in fixups.items():
-                    if info.get(key) != change.get("check"):
+                    check = change.get("check")
+                    if info.get(key) != check:
                         assert False, "Fixup check failed for {}.{}: {} != {}".format(
-                            info["name"], key, info.get(key, None), change["check"]
+                            info["name"], key, info.get(key, None), check
                         )
                     if "fixup" in change:
                         info[key] = change["fixup"]
+            if info["id"] in workspaceMemberIds:
+                infoFields = WORKSPACE_MEMBER_INFO_FIELDS
+            else:
+                infoFields = PACKAGE_INFO_FIELDS
+            for key in [key for key in info if key not in infoFields]:
+                del info[key]
+            # Remember the package's root directory, where we look for its license file.
+            info["_root"] = os.path.dirname(info["manifest_path"])
             # Index packages for fast lookup.
             assert info["id"] not in self.pkgInfoById
             self.pkgInfoById[info["id"]] = info
             assert info["manifest_path"] not in self.pkgInfoByManifestPath
             self.pkgInfoByManifestPath[info["manifest_path"]] = info
+            if info["name"] in PACKAGES_WITH_EXTRA_DEPENDENCIES:
+                self.extraDependenciesById[info["id"]] = (
+                    PACKAGES_WITH_EXTRA_DEPENDENCIES[info["name"]]
+                )
         # Add fake packages for things managed outside of cargo.
         for name, info in EXTRA_PACKAGE_METADATA.items():
             assert name not in self.pkgInfoById
@@ -1072,20 +1370,33 @@ class WorkspaceMetadata:
     def get_package_by_manifest_path(self, path):
         return self.pkgInfoByManifestPath[path]
 
-    def get_dependency_summary(self, packages, targets=None):
+    def get_dependency_summary(
+        self, packages, targets=None, deferSharedLicenseText=False
+    ):
         """Get dependency and license summary information.
 
         This method will yield dependency summary information for the named package. When the `targets`
         argument is specified it will yield information for the named package when compiled for just
         those targets.
+
+        When `deferSharedLicenseText` is true, the license text for dependencies whose license has
+        shared text is not fetched up-front; see `get_license_info` for details.
         """
         deps = set()
         for package in packages:
             deps |= self.get_package_dependencies(package, targets)
-        for id in deps:
-            if not self.is_external_dependency(id):
-                continue
-            yield self.get_license_info(id)
+        externalDeps = [id for id in deps if self.is_external_dependency(id)]
+        # Finding license info may require several HTTP requests per dependency, so do it concurrently,
+        # yielding each result as soon as it's ready since the order of `deps` is arbitrary anyway.
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=HTTP_MAX_CONCURRENT_REQUESTS
+        ) as executor:
+            futures = [
+                executor.submit(self.get_license_info, id, deferSharedLicenseText)
+                for id in externalDeps
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
 
     def get_package_dependencies(self, name, targets=None):
         """Get the set of dependencies for the named package, when compiling for the specified targets.
@@ -1095,38 +1406,53 @@ class WorkspaceMetadata:
         but requires using unstable cargo features and hence cargo nightly.
         """
         targets = self.get_compatible_targets_for_package(name, targets)
-        cargo_args = (
-            # last nightly that supported --build-plan, details:
-            # https://github.com/rust-lang/cargo/issues/7614
-            "+nightly-2025-11-08",
-            "-Z",
-            "unstable-options",
-            "build",
-            "--build-plan",
-            "--quiet",
-            "--locked",
-            "--package",
-            name,
-        )
+        # Some of our targets are built as the same cargo target, so only plan each of them once.
+        cargoTargets = list(dict.fromkeys(map(self.get_cargo_target, targets)))
         deps = set()
-        for target in targets:
-            this_target = (
-                "x86_64-apple-darwin" if target == "fake-target-for-ios" else target
-            )
-            buildPlan = subprocess_run_cargo(
-                cargo_args
-                + (
-                    "--target",
-                    this_target,
-                )
-            )
-            buildPlan = json.loads(buildPlan)
-            for manifestPath in buildPlan["inputs"]:
-                info = self.get_package_by_manifest_path(manifestPath)
-                deps.add(info["id"])
+        # Each target needs its own (slow) invocation of cargo, so run them concurrently.
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(cargoTargets), 1)
+        ) as executor:
+            for targetDeps in executor.map(
+                functools.partial(self.get_package_dependencies_for_target, name),
+                cargoTargets,
+            ):
+                deps |= targetDeps
         deps |= self.get_extra_dependencies_not_managed_by_cargo(name, targets, deps)
         return deps
 
+    def get_package_dependencies_for_target(self, name, target):
+        """Get the set of cargo-managed dependencies for the named package, when compiling for a single target."""
+        this_target = self.get_cargo_target(target)
+        buildPlan = subprocess_run_cargo(
+            (
+                # last nightly that supported --build-plan, details:
+                # https://github.com/rust-lang/cargo/issues/7614
+                "+nightly-2025-11-08",
+                "-Z",
+                "unstable-options",
+                "build",
+                "--build-plan",
+                "--quiet",
+                "--locked",
+                "--package",
+                name,
+                "--target",
+                this_target,
+                # Cargo locks the target directory while planning a build, so give each target
+                # its own directory in order for the concurrent invocations not to block each other.
+                "--target-dir",
+                os.path.join(
+                    self.metadata["target_directory"], "dependency-summary", this_target
+                ),
+            )
+        )
+        buildPlan = json_loads(buildPlan)
+        return frozenset(
+            self.get_package_by_manifest_path(manifestPath)["id"]
+            for manifestPath in buildPlan["inputs"]
+        )
+
     def get_extra_dependencies_not_managed_by_cargo(self, name, targets, deps):
         """Get additional dependencies for things managed outside of cargo.
 
@@ -1138,10 +1464,10 @@ class WorkspaceMetadata:
             if self.target_is_android(target):
                 extras.add("ext-jna")
                 extras.add("ext-protobuf")
-        for dep in deps:
-            name = self.pkgInfoById[dep]["name"]
-            if name in PACKAGES_WITH_EXTRA_DEPENDENCIES:
-                extras |= set(PACKAGES_WITH_EXTRA_DEPENDENCIES[name])
+        # Only a handful of packages have extra dependencies, so intersecting with them
+        # is much cheaper than checking each of the (many) deps individually.
+        for dep in deps & self.extraDependenciesById.keys():
+            extras.update(self.extraDependenciesById[dep])
         return extras
 
     def get_compatible_targets_for_package(self, name, targets=None):
@@ -1163,17 +1489,17 @@ class WorkspaceMetadata:
                 ]
         return targets
 
+    def get_cargo_target(self, target):
+        """Get the target to pass to cargo when building for the given target."""
+        return "x86_64-apple-darwin" if target == "fake-target-for-ios" else target
+
     def target_is_android(self, target):
         """Determine whether the given build target is for an android platform."""
-        if target.endswith("-android") or target.endswith("-androideabi"):
-            return True
-        return False
+        return target.endswith(("-android", "-androideabi"))
 
     def target_is_ios(self, target):
         """Determine whether the given build target is for an iOS platform."""
-        if target.endswith("-ios"):
-            return True
-        return False
+        return target.endswith("-ios")
 
     def is_external_dependency(self, id):
         """Check whether the named package is an external dependency."""
@@ -1184,24 +1510,26 @@ class WorkspaceMetadata:
         except KeyError:
             # There's no "source" key in info for externally-managed dependencies
             return True
-        manifest = pkgInfo["manifest_path"]
-        root = os.path.commonprefix([manifest, self.metadata["workspace_root"]])
-        if root != self.metadata["workspace_root"]:
-            return True
-        return False
+        return not pkgInfo["manifest_path"].startswith(self.workspaceRootPrefix)
 
     def get_manifest_path(self, id):
         """Get the path to a package's Cargo manifest."""
         return self.pkgInfoById[id]["manifest_path"]
 
-    def get_license_info(self, id):
-        """Get the licensing info for the named dependency, or error if it can't be determined."""
+    def get_license_info(self, id, deferSharedLicenseText=False):
+        """Get the licensing info for the named dependency, or error if it can't be determined.
+
+        Fetching license text can be slow, and for licenses with shared text we typically only
+        need one copy of it. So when `deferSharedLicenseText` is true and the dependency's license
+        has shared text, the returned info has a "fetch_license_text" function in place of its
+        "license_text"; use `get_license_text` to get the text from either form.
+        """
         pkgInfo = self.pkgInfoById[id]
         chosenLicense = self.pick_most_acceptable_license(id, pkgInfo["license"])
         licenseFile = self._find_license_file(id, chosenLicense, pkgInfo)
         assert pkgInfo["name"] is not None
         assert pkgInfo["repository"] is not None
-        return {
+        info = {
             "name": pkgInfo["name"],
             "id": pkgInfo.get(
                 "id", pkgInfo["name"]
@@ -1209,11 +1537,17 @@ class WorkspaceMetadata:
             "repository": pkgInfo["repository"],
             "license": chosenLicense,
             "license_file": licenseFile,
-            "license_text": self._fetch_license_text(id, licenseFile, pkgInfo),
             "license_url": self._find_license_url(
                 id, chosenLicense, licenseFile, pkgInfo
             ),
         }
+        if deferSharedLicenseText and license_has_shared_text(chosenLicense):
+            info["fetch_license_text"] = functools.partial(
+                self._get_license_text, id, licenseFile, pkgInfo
+            )
+        else:
+            info["license_text"] = self._get_license_text(id, licenseFile, pkgInfo)
+        return info
 
     def pick_most_acceptable_license(self, id, licenseId):
         """Select the best license under which to redistribute a dependency.
@@ -1223,23 +1557,12 @@ class WorkspaceMetadata:
         based on whether it's acceptable at all, and then how convenient it is to work with
         here in the license summary tool...
         """
-        # Special cases for the very few deps with "AND" in their license.
-        # `encoding_rs`
-        if licenseId == "(Apache-2.0 OR MIT) AND BSD-3-Clause":
-            return licenseId
-        # `unicode-ident`
-        if licenseId == "(MIT OR Apache-2.0) AND Unicode-3.0":
-            return licenseId
-
-        # Split "A/B" and "A OR B" into individual license names.
-        licenses = set(l.strip() for l in re.split(r"\s*(?:/|\sOR\s)\s*", licenseId))
-        # Try to pick the "best" compatible license available.
-        for license in LICENSES_IN_PREFERENCE_ORDER:
-            if license in licenses:
-                return license
-        raise RuntimeError(
-            f"Could not determine acceptable license for {id}; license is '{licenseId}'"
-        )
+        license = parse_most_acceptable_license(licenseId)
+        if license is None:
+            raise RuntimeError(
+                f"Could not determine acceptable license for {id}; license is '{licenseId}'"
+            )
+        return license
 
     def _find_license_file(self, id, license, pkgInfo):
         logging.info("finding license file for %s", id)
@@ -1248,7 +1571,7 @@ class WorkspaceMetadata:
             return licenseFile
         # No explicit license file was declared, let's see if we can unambiguously identify one
         # using common naming conventions.
-        pkgRoot = os.path.dirname(pkgInfo["manifest_path"])
+        pkgRoot = pkgInfo["_root"]
         try:
             licenseFileNames = COMMON_LICENSE_FILE_NAMES[license]
         except KeyError:
@@ -1279,13 +1602,14 @@ class WorkspaceMetadata:
         if "license_text" in pkgInfo:
             return pkgInfo["license_text"]
         if licenseFile.startswith("https://"):
-            r = requests.get(licenseFile)
-            r.raise_for_status()
-            return r.content.decode("utf8")
+            return http_get_text(licenseFile)
         else:
-            pkgRoot = os.path.dirname(pkgInfo["manifest_path"])
-            with open(os.path.join(pkgRoot, licenseFile)) as f:
-                return f.read()
+            pkgRoot = pkgInfo["_root"]
+            return read_text_file(os.path.realpath(os.path.join(pkgRoot, licenseFile)))
+
+    def _get_license_text(self, id, licenseFile, pkgInfo):
+        text = self._fetch_license_text(id, licenseFile, pkgInfo)
+        return self.licenseTexts.setdefault(text, text)
 
     def _find_license_url(self, id, chosenLicense, licenseFile, pkgInfo):
         """Find an appropriate URL at which humans can view a project's license."""
@@ -1294,7 +1618,7 @@ class WorkspaceMetadata:
             return licenseUrl
         # Try to infer a suitable URL from the local license file
         # and github repo metadata.
-        if urlparse(licenseFile).scheme:
+        if licenseFile.startswith("https://"):
             licenseUrl = licenseFile
         else:
             repo = pkgInfo["repository"]
@@ -1311,17 +1635,20 @@ class WorkspaceMetadata:
                         if repo.endswith(strip_suffix):
                             repo = repo[: -len(strip_suffix)]
                     # Try a couple of common locations for the license file.
+                    rawRepo = repo.replace("github.com", "raw.githubusercontent.com")
+                    # Packages are already looked up concurrently, so we probe these one at a
+                    # time in order of preference, stopping at the first that exists.
                     for path in [
                         "/main/",
                         "/master/",
                         "/main/{}/".format(pkgInfo["name"]),
                         "/master/{}/".format(pkgInfo["name"]),
                     ]:
-                        licenseUrl = repo.replace(
-                            "github.com", "raw.githubusercontent.com"
+                        licenseUrl = rawRepo + path + licenseFile
+                        # We only need to know whether the file exists, not its contents.
+                        r = HTTP_SESSION.head(
+                            licenseUrl, allow_redirects=True, timeout=HTTP_TIMEOUT
                         )
-                        licenseUrl += path + licenseFile
-                        r = requests.get(licenseUrl)
                         if r.status_code == 200:
                             # Found it!
                             # TODO: We could check whether the content matches what was on disk.
@@ -1337,11 +1664,7 @@ class WorkspaceMetadata:
             raise RuntimeError(err)
         # As a special case, convert raw github URLs back into human-friendly page URLs.
         if licenseUrl.startswith("https://raw.githubusercontent.com/"):
-            licenseUrl = re.sub(
-                r"raw.githubusercontent.com/([^/]+)/([^/]+)/",
-                r"github.com/\1/\2/blob/",
-                licenseUrl,
-            )
+            licenseUrl = RAW_GITHUB_URL_RE.sub(r"github.com/\1/\2/blob/", licenseUrl)
         return licenseUrl
 
 
@@ -1364,6 +1687,29 @@ def make_license_title(license, deps=None):
     return title
 
 
+@functools.lru_cache(maxsize=None)
+def hash_license_text(text):
+    """Hash a license text, ignoring any differences in whitespace.
+
+    This is memoized, since many dependencies share identical license text.
+    """
+    text = "".join(text.split())
+    return hashlib.blake2b(text.encode("utf8"), digest_size=16).hexdigest()
+
+
+def license_has_shared_text(license):
+    """Check whether dependencies with the given license can all share a single copy of its text."""
+    return license in SHARED_TEXT_LICENSES or license.startswith("EXT-")
+
+
+def get_license_text(info):
+    """Get the license text from a dependency's license info, fetching it now if it was deferred."""
+    try:
+        return info["license_text"]
+    except KeyError:
+        return info["fetch_license_text"]()
+
+
 def group_dependencies_for_printing(deps):
     """Iterate over groups of dependencies and their license info, in print order.
 
@@ -1374,19 +1720,16 @@ def group_dependencies_for_printing(deps):
     # Group by shared license text where possible.
     depsByLicenseTextHash = collections.defaultdict(list)
     for info in deps:
-        if info["license"] in ("MPL-2.0", "Apache-2.0") or info["license"].startswith(
-            "EXT-"
-        ):
+        license = info["license"]
+        if license_has_shared_text(license):
             # We know these licenses to have shared license text, sometimes differing on e.g. punctuation details.
             # XXX TODO: should check this more explicitly to ensure they contain the expected text.
-            licenseTextHash = info["license"]
+            depsByLicenseTextHash[license].append(info)
         else:
             # Other license texts typically include copyright notices that we can't dedupe, except on whitespace.
-            text = "".join(info["license_text"].split())
-            licenseTextHash = (
-                info["license"] + ":" + hashlib.sha256(text.encode("utf8")).hexdigest()
-            )
-        depsByLicenseTextHash[licenseTextHash].append(info)
+            depsByLicenseTextHash[
+                license + ":" + hash_license_text(info["license_text"])
+            ].append(info)
 
     # Add summary information for each group.
     groups = []
@@ -1398,12 +1741,12 @@ def group_dependencies_for_printing(deps):
         # Find single canonical license text for the group, which is the whole point of grouping.
         license = deps[0]["license"]
         if licenseTextHash != "Apache-2.0":
-            licenseText = deps[0]["license_text"]
+            licenseText = get_license_text(deps[0])
         else:
             # As a bit of a hack, we need to find a copy of the "canonical" apache license text
             # that still has the copyright placeholders in it, and no project-specific additions.
             for dep in deps:
-                licenseText = dep["license_text"]
+                licenseText = get_license_text(dep)
                 if "[yyyy]" in licenseText and "NSS" not in licenseText:
                     break
             else:
@@ -1411,7 +1754,7 @@ def group_dependencies_for_printing(deps):
 
         # Make a nice human-readable description for the group.
         # For some licenses we don't want to list all the deps in the title.
-        if license in ("MPL-2.0", "Apache-2.0"):
+        if license in SHARED_TEXT_LICENSES:
             title = make_license_title(license)
         else:
             title = make_license_title(license, deps)
@@ -1430,10 +1773,10 @@ def group_dependencies_for_printing(deps):
     # List groups in the order in which we prefer their license, then in alphabetical order
     # of the dependency names. This ensures a convenient and stable ordering.
     def sort_key(group):
-        for i, license in enumerate(LICENSES_IN_PREFERENCE_ORDER):
-            if group["license"] == license:
-                return (i, [d["name"] for d in group["dependencies"]])
-        return (i + 1, [d["name"] for d in group["dependencies"]])
+        return (
+            LICENSE_RANK.get(group["license"], len(LICENSE_RANK)),
+            tuple(d["name"] for d in group["dependencies"]),
+        )
 
     groups.sort(key=sort_key)
     return groups
@@ -1442,10 +1785,19 @@ def group_dependencies_for_printing(deps):
 def print_dependency_summary_markdown(deps, file=sys.stdout):
     """Print a nicely-formatted summary of dependencies and their license info."""
 
+    # Accumulate output in a buffer and write it out a section at a time,
+    # which is much cheaper than a separate `print` for each line.
+    buf = []
+
     def pf(string, *args):
         if args:
             string = string.format(*args)
-        print(string, file=file)
+        buf.append(string)
+        buf.append("\n")
+
+    def flush():
+        file.write("".join(buf))
+        buf.clear()
 
     pf("# Licenses for Third-Party Dependencies")
     pf("")
@@ -1462,20 +1814,17 @@ def print_dependency_summary_markdown(deps, file=sys.stdout):
 
     # First a "table of contents" style thing.
     for section in sections:
-        header = section["title"]
-        anchor = (
-            header.lower()
-            .replace(" ", "-")
-            .replace(".", "")
-            .replace(",", "")
-            .replace(":", "")
+        pf(
+            "* [{}](#{})",
+            section["title"],
+            section["title"].lower().translate(MARKDOWN_ANCHOR_TRANSLATION),
         )
-        pf("* [{}](#{})", header, anchor)
 
     pf("-------------")
 
-    # Now the actual license details.
+    # Now the actual license details, writing out what we have so far before each section.
     for section in sections:
+        flush()
         pf("## {}", section["title"])
         pf("")
         pkgs = [
@@ -1494,15 +1843,24 @@ def print_dependency_summary_markdown(deps, file=sys.stdout):
         pf("{}", section["license_text"])
         pf("```")
         pf("-------------")
+    flush()
 
 
 def print_dependency_summary_pom(deps, file=sys.stdout):
     """Print a summary of dependencies and their license info in .pom file XML format."""
 
+    # Buffered the same way as in `print_dependency_summary_markdown`.
+    buf = []
+
     def pf(string, *args):
         if args:
             string = string.format(*args)
-        print(string, file=file)
+        buf.append(string)
+        buf.append("\n")
+
+    def flush():
+        file.write("".join(buf))
+        buf.clear()
 
     pf("<licenses>")
     pf("<!--")
@@ -1538,8 +1896,23 @@ def print_dependency_summary_pom(deps, file=sys.stdout):
             )
             pf("    <url>{}</url>", saxutils.escape(dep["license_url"]))
             pf("  </license>")
+        flush()
 
     pf("</licenses>")
+    flush()
+
+
+def print_dependency_summary_json(deps, file=sys.stdout):
+    """Print a summary of dependencies and their license info as a JSON array.
+
+    Each dependency is serialized individually, so we never build an intermediate list of them all.
+    """
+    file.write("[")
+    for i, info in enumerate(deps):
+        if i > 0:
+            file.write(", ")
+        file.write(json.dumps(info))
+    file.write("]")
 
 
 if __name__ == "__main__":
@@ -1571,8 +1944,16 @@ if __name__ == "__main__":
         action="store",
         help="suppress output, instead checking that it matches the given file",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="don't use or update the on-disk cache of `cargo` output and license texts",
+    )
     args = parser.parse_args()
 
+    if args.no_cache:
+        CACHE_DIR = None
+
     # Default to listing dependencies for the "megazord" and "megazord_ios" packages,
     # which together include everything we might possibly incorporate into in a built distribution.
     if not args.packages:
@@ -1585,28 +1966,35 @@ if __name__ == "__main__":
         )
 
     metadata = get_workspace_metadata()
-    deps = metadata.get_dependency_summary(args.packages, args.targets)
+    # The JSON output includes each dependency's license text, but other formats only need
+    # one copy of the license text for each group of dependencies with shared text.
+    deps = metadata.get_dependency_summary(
+        args.packages, args.targets, deferSharedLicenseText=args.format != "json"
+    )
 
-    if args.check:
-        output = io.StringIO()
-    else:
-        output = sys.stdout
+    # Render the complete output in memory and then write it in one go, which avoids
+    # lots of small writes and means we don't emit partial output if something fails.
+    output = io.StringIO()
 
     if args.format == "json":
-        json.dump([info for info in deps], output)
+        print_dependency_summary_json(deps, file=output)
     elif args.format == "pom":
         print_dependency_summary_pom(deps, file=output)
     else:
         print_dependency_summary_markdown(deps, file=output)
 
     if args.check:
-        output.seek(0)
-        outlines = output.readlines()
         with open(args.check) as f:
-            checklines = f.readlines()
-            if outlines != checklines:
-                raise RuntimeError(
-                    "Dependency details have changed from those in {}:\n{}".format(
-                        args.check, "".join(difflib.unified_diff(checklines, outlines))
-                    )
+            checktext = f.read()
+        outtext = output.getvalue()
+        # Only bother splitting into lines and diffing if there are actually changes to report.
+        if outtext != checktext:
+            checklines = checktext.splitlines(keepends=True)
+            outlines = outtext.splitlines(keepends=True)
+            raise RuntimeError(
+                "Dependency details have changed from those in {}:\n{}".format(
+                    args.check, "".join(difflib.unified_diff(checklines, outlines))
                 )
+            )
+    else:
+        sys.stdout.write(output.getvalue())